@@ -0,0 +1,212 @@
+"""
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Heart Rate Engine Benchmark
+--------------------------------------------------------------------------
+Copyright 2019, Octavo Systems, LLC. All rights reserved.
+
+License:
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+this list of conditions and the following disclaimer in the documentation
+and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Heart Rate Engine Benchmark
+
+    Compares the heart rate engines in hrm_engine.py on synthetic and
+    recorded PPG.  For every engine and waveform it reports:
+
+        us/sample  - CPU time per update() call
+        state      - size of the engine state in bytes
+        peak       - peak memory allocated while running (Python 3 only)
+        ref diff   - mean absolute difference to the reference engine (bpm)
+        true diff  - mean absolute difference to the true rate (synthetic)
+
+    Rates are compared every UPDATE_SAMPLES samples, as health_monitor.py
+    reports them, after a WARMUP_SECONDS settling time.  Every synthetic
+    rate is run at each of the NOISE_LEVELS (standard deviation of the
+    added noise; the pulse amplitude is ppg_synth.PPG_AMPLITUDE).
+
+    Can be run on the PocketBeagle itself (Python 2 or 3) to get the CPU
+    numbers for the board.
+
+--------------------------------------------------------------------------
+Usage:
+
+    python bench_hrm_engine.py
+    python bench_hrm_engine.py --seconds 120 --recording logs/ppg.txt
+    python bench_hrm_engine.py --rates 45 60 80 --noise 1000
+--------------------------------------------------------------------------
+"""
+import sys
+import time
+import argparse
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from hrm_engine import HRM_ENGINES, HRM_FREQUENCY, create_engine
+from ppg_synth import synthetic_ppg, load_recording
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+SYNTHETIC_RATES    = [50, 72, 100, 140]
+NOISE_LEVELS       = [100, 400, 1000]
+
+UPDATE_SAMPLES     = 700
+WARMUP_SECONDS     = 20
+
+if hasattr(time, "process_time"):
+    cpu_time = time.process_time
+else:
+    cpu_time = time.clock
+
+
+# ------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------
+def state_size(engine):
+    '''
+    Approximate size in bytes of the engine's attributes
+    '''
+    size = sys.getsizeof(engine.__dict__)
+    for value in engine.__dict__.values():
+        size += sys.getsizeof(value)
+        if isinstance(value, list):
+            size += sum(sys.getsizeof(v) for v in value)
+    return size
+# End def
+
+
+def run_engine(name, samples):
+    '''
+    Feeds all samples to a new engine; returns (cpu seconds, reported rates, state size)
+    '''
+    engine = create_engine(name, HRM_FREQUENCY)
+    rates  = []
+    update = engine.update
+
+    start = cpu_time()
+    for n, data in enumerate(samples, 1):
+        update(data)
+        if n % UPDATE_SAMPLES == 0:
+            rates.append(engine.get_rate())
+    elapsed = cpu_time() - start
+
+    return elapsed, rates, state_size(engine)
+# End def
+
+
+def peak_memory(name, samples):
+    if tracemalloc is None:
+        return None
+
+    tracemalloc.start()
+    run_engine(name, samples)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+# End def
+
+
+def mean_abs_diff(a, b):
+    skip  = (WARMUP_SECONDS * HRM_FREQUENCY) // UPDATE_SAMPLES
+    pairs = list(zip(a, b))[skip:]
+    if not pairs:
+        return None
+    return sum(abs(x - y) for x, y in pairs) / float(len(pairs))
+# End def
+
+
+def format_value(value, fmt):
+    if value is None:
+        return "n/a"
+    return fmt.format(value)
+# End def
+
+
+def benchmark(label, samples, true_rate, engines):
+    print("")
+    print("{0} ({1} samples)".format(label, len(samples)))
+    print("| {0:<10s} | {1:>9s} | {2:>7s} | {3:>9s} | {4:>8s} | {5:>9s} |".format(
+          "engine", "us/sample", "state", "peak", "ref diff", "true diff"))
+    print("|------------|-----------|---------|-----------|----------|-----------|")
+
+    reference = run_engine("reference", samples)[1]
+
+    for name in engines:
+        elapsed, rates, state = run_engine(name, samples)
+        peak = peak_memory(name, samples)
+        truth = None
+        if true_rate is not None:
+            truth = mean_abs_diff(rates, [true_rate] * len(rates))
+
+        print("| {0:<10s} | {1:>9s} | {2:>7d} | {3:>9s} | {4:>8s} | {5:>9s} |".format(
+              name,
+              format_value(1e6 * elapsed / len(samples), "{0:0.2f}"),
+              state,
+              format_value(peak, "{0:d}"),
+              format_value(mean_abs_diff(rates, reference), "{0:0.1f}"),
+              format_value(truth, "{0:0.1f}")))
+# End def
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Heart rate engine benchmark")
+    parser.add_argument("--seconds", type=float, default=60.0,
+                        help="length of each synthetic waveform")
+    parser.add_argument("--rates", type=int, nargs="+", default=SYNTHETIC_RATES,
+                        help="synthetic heart rates in bpm")
+    parser.add_argument("--noise", type=int, nargs="+", default=NOISE_LEVELS,
+                        help="noise levels of the synthetic waveforms")
+    parser.add_argument("--recording", action="append", default=[],
+                        help="recorded waveform, one sample per line (100 Hz)")
+    parser.add_argument("--engines", nargs="+",
+                        default=sorted(HRM_ENGINES, key=lambda n: (n != "reference", n)),
+                        choices=sorted(HRM_ENGINES))
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+# End def
+
+
+# ------------------------------------------------------------------------
+# Main code
+# ------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+
+    for noise in args.noise:
+        for rate in args.rates:
+            samples = synthetic_ppg(rate, args.seconds, HRM_FREQUENCY,
+                                    noise=noise, seed=args.seed)
+            benchmark("Synthetic {0} bpm, noise {1}".format(rate, noise),
+                      samples, rate, args.engines)
+
+    for filename in args.recording:
+        benchmark("Recording {0}".format(filename), load_recording(filename),
+                  None, args.engines)
@@ -0,0 +1,135 @@
+"""
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Loop Profiler Overhead Benchmark
+--------------------------------------------------------------------------
+Copyright 2019, Octavo Systems, LLC. All rights reserved.
+
+License:
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+this list of conditions and the following disclaimer in the documentation
+and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Loop Profiler Overhead Benchmark
+
+    Measures what the stage timers in loop_profiler.py add to one
+    iteration of the sampling loop when no capture is running: a loop with
+    the same number of stages as health_monitor.py is timed without any
+    instrumentation, with a disabled LoopProfiler and with an enabled one.
+    The overhead is reported per iteration and as a share of the 10 ms
+    sample period.
+
+    Run it on the PocketBeagle itself (Python 2 or 3) to get the numbers
+    for the board.
+
+--------------------------------------------------------------------------
+Usage:
+
+    python bench_profiler.py
+    python bench_profiler.py --iterations 1000000
+--------------------------------------------------------------------------
+"""
+import sys
+import argparse
+
+from loop_profiler import LoopProfiler, PROFILE_FREQUENCY, clock
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+STAGES             = ["i2c_read", "convert2int", "hrm_update", "waveform",
+                      "get_rate", "send_update", "sleep"]
+
+REPEATS            = 5
+
+
+# ------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------
+def stage_work(x):
+    return x + 1
+# End def
+
+
+def run_plain(iterations):
+    x = 0
+    start = clock()
+    for n in range(iterations):
+        for stage in STAGES:
+            x = stage_work(x)
+    return clock() - start
+# End def
+
+
+def run_profiled(iterations, profiler):
+    x = 0
+    begin = profiler.begin
+    lap   = profiler.lap
+    start = clock()
+    for n in range(iterations):
+        begin()
+        for stage in STAGES:
+            x = stage_work(x)
+            lap(stage)
+    return clock() - start
+# End def
+
+
+def best_of(function, *args):
+    return min(function(*args) for i in range(REPEATS))
+# End def
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Loop profiler overhead benchmark")
+    parser.add_argument("--iterations", type=int, default=200000)
+    return parser.parse_args(argv)
+# End def
+
+
+# ------------------------------------------------------------------------
+# Main code
+# ------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    args   = parse_args(sys.argv[1:])
+    period = 1.0 / PROFILE_FREQUENCY
+
+    plain    = best_of(run_plain, args.iterations)
+    disabled = best_of(run_profiled, args.iterations, LoopProfiler(enabled=False))
+    enabled  = best_of(run_profiled, args.iterations, LoopProfiler(enabled=True))
+
+    print("{0} iterations of {1} stages, best of {2}".format(
+          args.iterations, len(STAGES), REPEATS))
+    print("| {0:<18s} | {1:>12s} | {2:>14s} | {3:>12s} |".format(
+          "mode", "us/iteration", "overhead us", "% of period"))
+    print("|--------------------|--------------|----------------|--------------|")
+
+    for mode, elapsed in (("uninstrumented", plain), ("profiler disabled", disabled),
+                          ("profiler enabled", enabled)):
+        per_iteration = 1000000.0 * elapsed / args.iterations
+        overhead      = 1000000.0 * (elapsed - plain) / args.iterations
+        print("| {0:<18s} | {1:>12.3f} | {2:>14.3f} | {3:>11.3f}% |".format(
+              mode, per_iteration, overhead, 100.0 * overhead / (1000000.0 * period)))
@@ -0,0 +1,305 @@
+"""
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Waveform Streaming Benchmark
+--------------------------------------------------------------------------
+Copyright 2019, Octavo Systems, LLC. All rights reserved.
+
+License:
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+this list of conditions and the following disclaimer in the documentation
+and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Waveform Streaming Benchmark
+
+    Measures the cost of streaming the 100 Hz waveform with
+    waveform_stream.py:
+
+    1) Encoding: for each chunk length and zlib level, the bandwidth in
+       bytes per second of waveform and the CPU time spent encoding one
+       second of waveform, compared to sending every sample as a text line.
+
+    2) Sustained streaming: samples are fed to a WaveformStreamer at the
+       real 100 Hz rate (or --speed times faster) and sent through a
+       WaveformSender with its default queue to a local TCP receiver.
+       Reports the CPU share of the sampling thread (encoding) and of the
+       sender thread, dropped frames and sequence gaps.  --latency makes
+       the receiver wait after each frame to emulate a slow gateway.
+
+    Can be run on the PocketBeagle itself (Python 2 or 3) to get the CPU
+    numbers for the board.
+
+--------------------------------------------------------------------------
+Usage:
+
+    python bench_waveform.py
+    python bench_waveform.py --seconds 600 --chunks 0.5 1 2 --levels 1 6 9
+    python bench_waveform.py --stream-seconds 60 --speed 20 --latency 0.2
+--------------------------------------------------------------------------
+"""
+import sys
+import time
+import socket
+import argparse
+import threading
+
+from ppg_synth import synthetic_ppg, load_recording
+from waveform_stream import (WF_HEADER, WF_FREQUENCY, WF_CHUNK_SECONDS,
+                             WF_COMPRESSION, WaveformSender,
+                             WaveformStreamer, encode_frame, decode_header,
+                             decode_payload, sequence_gap)
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+CHUNK_SECONDS      = [0.5, 1.0, 2.0, 5.0]
+LEVELS             = [1, 6, 9]
+
+if hasattr(time, "process_time"):
+    cpu_time = time.process_time
+else:
+    cpu_time = time.clock
+
+# Per-thread CPU time (Python 3.7+)
+thread_time = getattr(time, "thread_time", None)
+
+# Small receive buffer so a slow receiver pushes back on the sender
+# quickly, as a congested gateway would
+SLOW_RCVBUF        = 4096
+
+
+# ------------------------------------------------------------------------
+# FrameReceiver Class Definition
+# ------------------------------------------------------------------------
+class FrameReceiver(object):
+    '''
+    Local TCP receiver that decodes waveform frames in a thread
+    '''
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.server  = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if latency > 0:
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SLOW_RCVBUF)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(1)
+        self.port     = self.server.getsockname()[1]
+        self.samples  = []
+        self.frames   = 0
+        self.gaps     = 0
+        self.last     = None
+
+        self.thread        = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+    # End def
+
+    def read_exactly(self, conn, size):
+        data = b""
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+    # End def
+
+    def run(self):
+        conn, addr = self.server.accept()
+
+        while True:
+            header = self.read_exactly(conn, WF_HEADER.size)
+            if header is None:
+                break
+
+            session, sequence, timestamp, frequency, count, length = \
+                decode_header(header)
+            payload = self.read_exactly(conn, length)
+            if payload is None:
+                break
+            self.samples.extend(decode_payload(payload, count))
+
+            self.gaps   += sequence_gap(self.last, session, sequence)
+            self.last    = (session, sequence)
+            self.frames += 1
+
+            if self.latency > 0:
+                time.sleep(self.latency)
+
+        conn.close()
+        self.server.close()
+    # End def
+# End class
+
+
+# ------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------
+def bench_encoding(samples, chunk_seconds, level):
+    '''
+    Returns (bytes per second of waveform, CPU seconds per second of waveform)
+    '''
+    chunk_size = int(WF_FREQUENCY * chunk_seconds)
+    seconds    = float(len(samples)) / WF_FREQUENCY
+    total      = 0
+
+    start = cpu_time()
+    for n in range(0, len(samples), chunk_size):
+        total += len(encode_frame(n // chunk_size, 0.0,
+                                  samples[n:n + chunk_size], WF_FREQUENCY, level))
+    elapsed = cpu_time() - start
+
+    return total / seconds, elapsed / seconds
+# End def
+
+
+def bench_text(samples):
+    '''
+    Bandwidth if every sample were sent as a text line
+    '''
+    seconds = float(len(samples)) / WF_FREQUENCY
+    return sum(len("WF {0}\n".format(x)) for x in samples) / seconds
+# End def
+
+
+class TimedSender(WaveformSender):
+    '''
+    WaveformSender that records the CPU time used by its thread
+    '''
+    thread_cpu = None
+
+    def run(self):
+        WaveformSender.run(self)
+        if thread_time is not None:
+            self.thread_cpu = thread_time()
+    # End def
+# End class
+
+
+def format_share(cpu, wall):
+    if cpu is None:
+        return "n/a"
+    return "{0:0.3f} % of one core".format(100.0 * cpu / wall)
+# End def
+
+
+def bench_streaming(samples, chunk_seconds, level, speed, latency):
+    '''
+    Feeds samples at speed times the real sample rate through the
+    production send path (default queue size, drop when full)
+    '''
+    receiver = FrameReceiver(latency)
+    sender   = TimedSender("127.0.0.1", receiver.port)
+    streamer = WaveformStreamer(sender, WF_FREQUENCY, chunk_seconds, level)
+    seconds  = float(len(samples)) / WF_FREQUENCY
+    period   = 1.0 / (WF_FREQUENCY * speed)
+
+    print("")
+    print("Sustained streaming: {0:0.0f} s of waveform at {1:0.1f}x real time, "
+          "{2:0.1f} s chunks, level {3}, receiver latency {4:0.3f} s".format(
+          seconds, speed, chunk_seconds, level, latency))
+
+    start_wall = time.time()
+    start_cpu  = thread_time() if thread_time is not None else None
+    for n, data in enumerate(samples):
+        delay = start_wall + n * period - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        streamer.add_sample(data)
+    streamer.flush()
+    feed_wall = time.time() - start_wall
+    feed_cpu  = (thread_time() - start_cpu) if start_cpu is not None else None
+
+    streamer.close()
+    receiver.thread.join()
+
+    print("  Feed time:          {0:0.2f} s".format(feed_wall))
+    print("  Bandwidth:          {0:0.0f} bytes/s of waveform".format(
+          sender.sent_bytes / seconds))
+    print("  Sampling thread:    {0}".format(format_share(feed_cpu, feed_wall)))
+    print("  Sender thread:      {0}".format(format_share(sender.thread_cpu, feed_wall)))
+    print("  Frames sent:        {0} (dropped {1})".format(sender.sent, sender.dropped))
+    print("  Frames received:    {0} (gaps {1})".format(receiver.frames, receiver.gaps))
+    if sender.dropped == 0:
+        print("  Waveform matches:   {0}".format(
+              "yes" if receiver.samples == samples else "no"))
+# End def
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Waveform streaming benchmark")
+    parser.add_argument("--seconds", type=float, default=300.0,
+                        help="length of the synthetic waveform")
+    parser.add_argument("--rate", type=int, default=72,
+                        help="synthetic heart rate in bpm")
+    parser.add_argument("--recording", default=None,
+                        help="recorded waveform, one sample per line (100 Hz)")
+    parser.add_argument("--chunks", type=float, nargs="+", default=CHUNK_SECONDS,
+                        help="chunk lengths in seconds")
+    parser.add_argument("--levels", type=int, nargs="+", default=LEVELS,
+                        help="zlib compression levels")
+    parser.add_argument("--stream-seconds", type=float, default=30.0,
+                        help="length of waveform for the sustained streaming test")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="feed rate of the streaming test as a multiple of 100 Hz")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="receiver delay after each frame in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+# End def
+
+
+# ------------------------------------------------------------------------
+# Main code
+# ------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+
+    if args.recording:
+        samples = load_recording(args.recording)
+    else:
+        samples = synthetic_ppg(args.rate, args.seconds, WF_FREQUENCY, seed=args.seed)
+
+    raw  = 3 * WF_FREQUENCY
+    text = bench_text(samples)
+
+    print("Waveform: {0} samples ({1:0.0f} s)".format(
+          len(samples), float(len(samples)) / WF_FREQUENCY))
+    print("Raw 24-bit samples:   {0:8.0f} bytes/s".format(raw))
+    print("Text line per sample: {0:8.0f} bytes/s".format(text))
+    print("")
+    print("| chunk (s) | level | bytes/s | vs raw | vs text | CPU ms/s |")
+    print("|-----------|-------|---------|--------|---------|----------|")
+
+    for chunk_seconds in args.chunks:
+        for level in args.levels:
+            rate, cpu = bench_encoding(samples, chunk_seconds, level)
+            print("| {0:9.1f} | {1:5d} | {2:7.0f} | {3:5.1f}% | {4:6.1f}% | {5:8.3f} |".format(
+                  chunk_seconds, level, rate, 100.0 * rate / raw,
+                  100.0 * rate / text, 1000.0 * cpu))
+
+    stream = samples[:int(args.stream_seconds * WF_FREQUENCY)]
+    bench_streaming(stream, WF_CHUNK_SECONDS, WF_COMPRESSION, args.speed, args.latency)
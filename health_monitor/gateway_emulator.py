@@ -0,0 +1,346 @@
+"""
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Gateway Emulator
+--------------------------------------------------------------------------
+Copyright 2019, Octavo Systems, LLC. All rights reserved.
+
+License:
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+this list of conditions and the following disclaimer in the documentation
+and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Gateway Emulator
+
+    Local stand-in for the IoT gateway at GW_IP_ADDRESS:GW_PORT.  Accepts
+    TCP connections, parses the "HR <rate> <temp> <kPa> <humidity>" records
+    sent by msg_client and answers each one with "OK" (or "ERR" if the
+    record cannot be parsed).  Latency, dropped records and disconnects can
+    be injected to see how the transmit path behaves with a slow or failing
+    gateway.
+
+    Waveform frames (see waveform_stream.py) are accepted on a second port;
+    they are decoded and gaps in the sequence numbers are counted.  With
+    --record the decoded samples are written to a file, one per line, in
+    the format read by ppg_synth.load_recording() (for bench_hrm_engine.py).
+    Gaps are written as '#' comment lines.  Record from one board at a time.
+
+    Runs on the host (Python 3.7+), not on the PocketBeagle.
+
+--------------------------------------------------------------------------
+Usage:
+
+    python3 gateway_emulator.py --port 50000 --latency 0.05 --jitter 0.02
+                                --drop-rate 0.01 --disconnect-rate 0.01
+                                --waveform-port 50001
+
+    python3 gateway_emulator.py --record logs/ppg.txt
+--------------------------------------------------------------------------
+"""
+import sys
+import time
+import random
+import asyncio
+import argparse
+import collections
+
+from waveform_stream import WF_HEADER, decode_header, decode_payload, sequence_gap
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+GW_IP_ADDRESS      = "0.0.0.0"
+GW_PORT            = 50000
+WF_PORT            = 50001
+
+HR_RECORD_TAG      = "HR"
+
+REPLY_OK           = b"OK\n"
+REPLY_ERR          = b"ERR\n"
+
+STATS_PERIOD       = 10.0
+
+# ------------------------------------------------------------------------
+# Record definition
+# ------------------------------------------------------------------------
+
+HRRecord = collections.namedtuple("HRRecord",
+                                  ["rate", "temperature", "pressure", "humidity"])
+
+
+def parse_record(line):
+    '''
+    Parse one "HR <rate> <temp> <kPa> <humidity>" line into an HRRecord.
+    Returns None if the line is not a valid record.
+    '''
+    fields = line.split()
+
+    if (len(fields) != 5) or (fields[0] != HR_RECORD_TAG):
+        return None
+
+    try:
+        return HRRecord(int(float(fields[1])), float(fields[2]),
+                        float(fields[3]), float(fields[4]))
+    except ValueError:
+        return None
+# End def
+
+
+# ------------------------------------------------------------------------
+# GatewayEmulator Class Definition
+# ------------------------------------------------------------------------
+class GatewayEmulator(object):
+
+    def __init__(self, latency=0.0, jitter=0.0, drop_rate=0.0,
+                 disconnect_rate=0.0, verbose=False, seed=None, record=None):
+        '''
+        GatewayEmulator(latency, jitter, drop_rate, disconnect_rate)
+        latency / jitter are in seconds; each reply is delayed by
+        latency + uniform(0, jitter).  drop_rate is the probability that a
+        record is silently discarded (no reply).  disconnect_rate is the
+        probability that a new connection is closed before it is read.
+        record is a file name to write the received waveform samples to.
+        '''
+        self.latency         = latency
+        self.jitter          = jitter
+        self.drop_rate       = drop_rate
+        self.disconnect_rate = disconnect_rate
+        self.verbose         = verbose
+        self.random          = random.Random(seed)
+        self.server          = None
+        self.wf_server       = None
+        self.wf_sequences    = {}
+        self.record          = record
+        self.record_file     = None
+        self.stats           = collections.Counter()
+    # End def
+
+    async def start(self, host=GW_IP_ADDRESS, port=GW_PORT):
+        '''
+        Start listening; returns the port actually bound (useful with port 0)
+        '''
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server.sockets[0].getsockname()[1]
+    # End def
+
+    async def start_waveform(self, host=GW_IP_ADDRESS, port=WF_PORT):
+        '''
+        Start listening for waveform frames; returns the port actually bound
+        '''
+        if self.record is not None:
+            self.record_file = open(self.record, "a")
+
+        self.wf_server = await asyncio.start_server(self.handle_waveform, host, port)
+        return self.wf_server.sockets[0].getsockname()[1]
+    # End def
+
+    async def stop(self):
+        for server in (self.server, self.wf_server):
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+        self.server    = None
+        self.wf_server = None
+
+        if self.record_file is not None:
+            self.record_file.close()
+            self.record_file = None
+    # End def
+
+    async def handle_client(self, reader, writer):
+        self.stats["connections"] += 1
+
+        if self.random.random() < self.disconnect_rate:
+            self.stats["disconnects"] += 1
+            writer.close()
+            return
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                line = line.decode("ascii", "replace").strip()
+                if not line:
+                    continue
+
+                self.stats["received"] += 1
+                record = parse_record(line)
+
+                if record is None:
+                    self.stats["malformed"] += 1
+                    writer.write(REPLY_ERR)
+                    await writer.drain()
+                    continue
+
+                if self.random.random() < self.drop_rate:
+                    self.stats["dropped"] += 1
+                    continue
+
+                delay = self.latency + self.random.uniform(0, self.jitter)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                if self.verbose:
+                    print("| {:10d} | {:15.3f} | {:12.2f} | {:14.2f} |".format(
+                          record.rate, record.temperature, record.humidity,
+                          record.pressure))
+
+                writer.write(REPLY_OK)
+                await writer.drain()
+                self.stats["acked"] += 1
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.stats["errors"] += 1
+        finally:
+            writer.close()
+    # End def
+
+    async def handle_waveform(self, reader, writer):
+        self.stats["wf_connections"] += 1
+
+        # Sequence numbers are tracked per board (peer address) so that
+        # frames lost while the board was disconnected show up as a gap;
+        # a board restart is not a gap (see sequence_gap())
+        board = writer.get_extra_info("peername")[0]
+
+        try:
+            while True:
+                header = await reader.readexactly(WF_HEADER.size)
+                session, sequence, timestamp, frequency, count, length = \
+                    decode_header(header)
+                samples = decode_payload(await reader.readexactly(length), count)
+
+                gap = sequence_gap(self.wf_sequences.get(board), session, sequence)
+                self.stats["wf_gaps"] += gap
+                self.wf_sequences[board] = (session, sequence)
+
+                if self.record_file is not None:
+                    self.write_samples(board, sequence, gap, samples)
+
+                self.stats["wf_frames"]  += 1
+                self.stats["wf_samples"] += len(samples)
+                self.stats["wf_bytes"]   += WF_HEADER.size + length
+
+                if self.verbose:
+                    print("WF {0} {1:0.3f} {2} samples {3} bytes".format(
+                          sequence, timestamp, len(samples), WF_HEADER.size + length))
+        except asyncio.IncompleteReadError:
+            pass
+        except (ValueError, ConnectionError):
+            self.stats["wf_errors"] += 1
+        finally:
+            writer.close()
+    # End def
+
+    def write_samples(self, board, sequence, gap, samples):
+        '''
+        Appends decoded samples to the recording, one per line
+        '''
+        if gap:
+            self.record_file.write("# {0} missing {1} frames before {2}\n".format(
+                                   board, gap, sequence))
+        self.record_file.write("".join("{0}\n".format(x) for x in samples))
+        self.record_file.flush()
+    # End def
+
+    def summary(self):
+        text = ("connections={0} received={1} acked={2} dropped={3} "
+                "malformed={4} disconnects={5} errors={6}".format(
+                    self.stats["connections"], self.stats["received"],
+                    self.stats["acked"], self.stats["dropped"],
+                    self.stats["malformed"], self.stats["disconnects"],
+                    self.stats["errors"]))
+
+        if self.stats["wf_connections"]:
+            text += (" wf_frames={0} wf_samples={1} wf_bytes={2} wf_gaps={3} "
+                     "wf_errors={4}".format(
+                         self.stats["wf_frames"], self.stats["wf_samples"],
+                         self.stats["wf_bytes"], self.stats["wf_gaps"],
+                         self.stats["wf_errors"]))
+        return text
+    # End def
+# End class
+
+
+# ------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Local IoT gateway emulator")
+    parser.add_argument("--host", default=GW_IP_ADDRESS)
+    parser.add_argument("--port", type=int, default=GW_PORT)
+    parser.add_argument("--waveform-port", type=int, default=WF_PORT,
+                        help="port for waveform frames (0 to disable)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="fixed reply delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="extra uniform random reply delay in seconds")
+    parser.add_argument("--drop-rate", type=float, default=0.0,
+                        help="probability a record is discarded without reply")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0,
+                        help="probability a connection is closed on accept")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true",
+                        help="print every record received")
+    parser.add_argument("--record", default=None,
+                        help="append received waveform samples to this file")
+    return parser.parse_args(argv)
+# End def
+
+
+async def serve(args):
+    gateway = GatewayEmulator(args.latency, args.jitter, args.drop_rate,
+                              args.disconnect_rate, args.verbose, args.seed,
+                              args.record)
+    port    = await gateway.start(args.host, args.port)
+
+    print("Gateway emulator listening on {0}:{1}".format(args.host, port))
+
+    if args.waveform_port:
+        wf_port = await gateway.start_waveform(args.host, args.waveform_port)
+        print("Waveform frames on {0}:{1}".format(args.host, wf_port))
+
+    try:
+        while True:
+            await asyncio.sleep(STATS_PERIOD)
+            print(gateway.summary())
+    finally:
+        await gateway.stop()
+        print(gateway.summary())
+# End def
+
+
+# ------------------------------------------------------------------------
+# Main code
+# ------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    start_time = time.time()
+
+    try:
+        asyncio.run(serve(parse_args(sys.argv[1:])))
+    except KeyboardInterrupt:
+        print("--- {0:0.2f} seconds ---".format(time.time() - start_time))
@@ -48,6 +48,9 @@ import serbus
 import time
 import multiprocessing
 from Adafruit_BME280 import *
+from hrm_engine import create_engine
+from waveform_stream import WaveformSender, WaveformStreamer
+from loop_profiler import LoopProfiler
 
 # ------------------------------------------------------------------------
 # Constants
@@ -57,6 +60,20 @@ GW_IP_ADDRESS      = "192.168.0.1"
 GW_PORT            = "50000"
 GW_COMMAND         = "/var/lib/cloud9/sensor_gateway/msg_client"
 
+# Heart rate engine, see hrm_engine.HRM_ENGINES ("reference" or "adaptive")
+HRM_ENGINE         = "reference"
+
+# Raw LED1-ALED1 waveform streaming (see waveform_stream.py)
+WF_STREAM          = False
+WF_PORT            = 50001
+WF_CHUNK_SECONDS   = 1.0
+
+# Sampling loop stage timers (see loop_profiler.py)
+#   kill -USR1 <pid>  - print stage timings and effective sample rate
+#   kill -USR2 <pid>  - start / stop a cProfile capture
+PROFILE_LOOP       = True
+SAMPLE_FREQUENCY   = 100
+
 # ------------------------------------------------------------------------
 # Global variables
 # ------------------------------------------------------------------------
@@ -512,150 +529,6 @@ class AFE4404(object):
         '''
         self.i2cdev.close()
     # End def
-    
-    def initHRMalgo(self):
-        '''
-        Initializes Heart Rate monitoring algorithm
-        '''
-        # Variable definitions
-        self.peakWindowHP         = [0 for i in range(21)]
-        self.lastOnsetValueLED1   = 0 
-        self.lastPeakValueLED1    = 0
-        self.HR                   = [0 for i in range(12)]
-        self.HeartRate            = 0
-        self.HeartRate2           = 0
-        self.temp                 = 0
-        self.lastPeak             = 0
-        self.lastOnset            = 0
-        self.movingWindowHP       = 0
-        self.ispeak               = 0
-        self.movingWindowCount    = 0
-        self.foundPeak            = 0
-        self.totalFoundPeak       = 0
-        self.frequency            = 0
-        self.currentRatio         = 0
-        self.frequency            = 100
-        self.movingWindowSize     = self.frequency / 50
-        self.smallest             = (self.frequency * 60) / 220
-    # End def
-    
-    def HRMalgo(self, data):
-        '''
-        Heart rate measuring algorithm
-        '''
-        self.movingWindowHP += data
-        
-        if self.movingWindowCount > self.movingWindowSize:
-            self.movingWindowCount = 0
-            self.HRMupdateWindow()
-            self.movingWindowHP = 0
-            self.ispeak = 0;
-            
-            if self.lastPeak > self.smallest:
-                self.ispeak = 1
-                
-                for i in range(10):
-                    if self.peakWindowHP[10] < self.peakWindowHP[10 - i]:
-                        self.ispeak = 0
-                    if self.peakWindowHP[10] < self.peakWindowHP[10 + i]:
-                        self.ispeak = 0
-                
-                if self.ispeak == 1:
-                    self.lastPeakValueLED1 = self.HRMfindMax()
-                    self.totalFoundPeak += 1
-                    
-                    if self.totalFoundPeak > 2:
-                        self.updateHeartRate()
-                        self.temp = self.HRMchooseRate()
-                        if (self.temp > 40) and (self.temp < 220):
-                            self.HeartRate2 = self.temp
-                    
-                    self.ispeak = 1
-                    self.lastPeak = 0
-                    self.foundPeak += 1
-            
-            if (self.lastOnset > self.smallest) and (self.ispeak == 0):
-                self.ispeak = 1
-                for i in range(10, 0, -1):
-                    if self.peakWindowHP[10] > self.peakWindowHP[10 - i]:
-                        self.ispeak = 0
-                    if self.peakWindowHP[10] > self.peakWindowHP[10 + i]:
-                        self.ispeak = 0
-                
-                if self.ispeak == 1:
-                    self.lastOnsetValueLED1 = self.HRMfindMin()
-                    self.totalFoundPeak += 1
-                    self.lastOnset = 0
-                    self.foundPeak += 1
-            
-            if self.foundPeak > 2:
-                self.foundPeak = 0
-                self.temp = self.HRMchooseRate()
-                if (self.temp > 40) and (self.temp < 220):
-                    self.HeartRate = self.temp
-        
-        self.movingWindowCount += 1
-        self.lastOnset += 1
-        self.lastPeak += 1
-    
-    # End def
-    
-    def HRMupdateWindow(self):
-        for i in range(20, 0, -1):
-            self.peakWindowHP[i] = self.peakWindowHP[i - 1]
-        self.peakWindowHP[0] = self.movingWindowHP/(self.movingWindowSize + 1)
-    # End def
-    
-    def HRMfindMax(self):
-        res = self.peakWindowHP[8]
-        for i in range(12, 8, -1):
-            if res < self.peakWindowHP[i]:
-                res = self.peakWindowHP[i]
-        return res
-    # End def
-    
-    def HRMfindMin(self):
-        res = self.peakWindowHP[8]
-        for i in range(12, 8, -1):
-            if res > self.peakWindowHP[i]:
-                res = self.peakWindowHP[i]
-        return res
-    # End def
-    
-    def HRMchooseRate(self):
-        maxx = self.HR[0]
-        minn = self.HR[0]
-        summ = 0
-        nb = 0
-        
-        for i in range(7, 0, -1):
-            if self.HR[i - 1] > 0:
-                if self.HR[i - 1] > maxx:
-                    maxx = self.HR[i - 1]
-                if self.HR[i - 1] < minn:
-                    minn = self.HR[i - 1]
-                
-                summ += self.HR[i - 1]
-                nb += 1
-        if nb > 2:
-            fullsum = (summ - maxx - minn)*10/(nb - 2)
-        else:
-            fullsum = (summ)*10/(nb + 1)
-        
-        summ = fullsum/10
-        
-        if (fullsum-summ*10) > 4:
-            summ += 1
-        return summ
-    # End def
-    
-    def updateHeartRate(self):
-        i = 60*self.frequency/self.lastPeak
-        if (i > 40) and (i < 220):
-            for i in range(11, 0, -1):
-                self.HR[i] = self.HR[i - 1]
-            self.HR[0] = 60*self.frequency/self.lastPeak
-    # End def
 # End class
 
 
@@ -684,7 +557,7 @@ def send_update(rate_out):
     # If there is no finger in place, zero out the array    
     if(x_int < 100000):
         rate_out = 0
-        heartrate.HR[:12] = [0]*12
+        hrm.clear_rate()
         
     degrees      = sensor.read_temperature()
     pascals      = sensor.read_pressure()
@@ -714,6 +587,14 @@ def send_update(rate_out):
 
 start_time    = 0
 heartrate     = None;
+hrm           = None
+streamer      = None
+profiler      = LoopProfiler(SAMPLE_FREQUENCY, PROFILE_LOOP)
+
+# Install the handlers before the ~12 s sensor initialization, otherwise
+# SIGUSR1 / SIGUSR2 sent during startup would terminate the program
+if PROFILE_LOOP:
+    profiler.install_signals()
 
 try:
         print("Initializing Temp/Humidity Sensor")
@@ -721,26 +602,50 @@ try:
         
         print("Initializing Heart Rate Sensor")
         heartrate = AFE4404()
-        heartrate.initHRMalgo()
+        hrm       = create_engine(HRM_ENGINE)
+
+        if WF_STREAM:
+            print("Streaming waveform to {0}:{1}".format(GW_IP_ADDRESS, WF_PORT))
+            streamer = WaveformStreamer(WaveformSender(GW_IP_ADDRESS, WF_PORT, gw_timeout),
+                                        chunk_seconds=WF_CHUNK_SECONDS)
 
         print("Starting Health Monitor")
         print("| Heart Rate | Temperature (C) | Humidity (%) | Pressure (kPa) |")
         print("|------------|-----------------|--------------|----------------|")
         
         start_time = time.time()
+        profiler.reset()
         i = 0
         while True:
+            profiler.begin()
             i        = i + 1
             x        = heartrate.getHeartsignal()
+            profiler.lap("i2c_read")
             data     = heartrate.convert2int(x)
-            rate     = heartrate.HRMalgo(data)            
-            rate_out = sum(heartrate.HR) / len(heartrate.HR)
+            profiler.lap("convert2int")
+            hrm.update(data)
+            profiler.lap("hrm_update")
+
+            if streamer is not None:
+                streamer.add_sample(data)
+                profiler.lap("waveform")
+
+            rate_out = hrm.get_rate()
+            profiler.lap("get_rate")
 
             if(i == 700):
                 send_update(rate_out)
                 i = 0
+                profiler.lap("send_update")
             time.sleep(0.01)
+            profiler.lap("sleep")
 
 except KeyboardInterrupt:
     print("--- {0:0.2f} seconds ---".format(time.time() - start_time))
-    heartrate.close()
\ No newline at end of file
+    heartrate.close()
+
+    if PROFILE_LOOP:
+        print(profiler.summary())
+
+    if streamer is not None:
+        streamer.close(gw_timeout)
\ No newline at end of file
@@ -0,0 +1,376 @@
+"""
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Heart Rate Engines
+--------------------------------------------------------------------------
+Copyright 2019, Octavo Systems, LLC. All rights reserved.
+
+License:
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+this list of conditions and the following disclaimer in the documentation
+and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Heart Rate Engines
+
+    Heart rate detection algorithms, independent of the AFE4404 driver.
+    Every engine is fed one LED1-ALED1 sample at a time with update() and
+    keeps the last 12 accepted beat-to-beat rates; get_rate() returns
+    their average, which is what the health monitor reports.
+
+    Engines:
+        reference  - the original AFE4404 peak/onset window algorithm
+        adaptive   - lighter adaptive-threshold beat detector
+
+    Select the engine with HRM_ENGINE in health_monitor.py.
+--------------------------------------------------------------------------
+"""
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+HRM_FREQUENCY      = 100
+HRM_HISTORY        = 12
+
+HRM_MIN_RATE       = 40
+HRM_MAX_RATE       = 220
+
+
+# ------------------------------------------------------------------------
+# HRMEngine Class Definition
+# ------------------------------------------------------------------------
+class HRMEngine(object):
+    '''
+    Base class for heart rate engines
+    '''
+    name = None
+
+    def __init__(self, frequency=HRM_FREQUENCY):
+        '''
+        HRMEngine(frequency)
+        frequency is the sample rate in Hz of the data passed to update()
+        '''
+        self.frequency = frequency
+        self.reset()
+    # End def
+
+    def reset(self):
+        '''
+        Clears all algorithm state
+        '''
+        self.HR        = [0 for i in range(HRM_HISTORY)]
+        self.HeartRate = 0
+        self.beats     = 0
+    # End def
+
+    def update(self, data):
+        '''
+        Feeds one sample; returns 1 if a beat was detected, 0 otherwise
+        '''
+        raise NotImplementedError
+    # End def
+
+    def get_rate(self):
+        '''
+        Average of the beat-to-beat rate history in beats per minute
+        '''
+        return sum(self.HR) // len(self.HR)
+    # End def
+
+    def clear_rate(self):
+        '''
+        Zeroes the rate history (e.g. when no finger is in place)
+        '''
+        self.HR[:HRM_HISTORY] = [0] * HRM_HISTORY
+    # End def
+
+    def add_rate(self, interval):
+        '''
+        Adds the rate for a beat-to-beat interval (in samples) to the history
+        '''
+        rate = 60 * self.frequency // interval
+        if (rate > HRM_MIN_RATE) and (rate < HRM_MAX_RATE):
+            for i in range(HRM_HISTORY - 1, 0, -1):
+                self.HR[i] = self.HR[i - 1]
+            self.HR[0] = rate
+    # End def
+# End class
+
+
+# ------------------------------------------------------------------------
+# ReferenceEngine Class Definition
+# ------------------------------------------------------------------------
+class ReferenceEngine(HRMEngine):
+    '''
+    Original AFE4404 heart rate algorithm: averages the signal over small
+    windows and looks for peaks / onsets in a 21 entry window history.
+    '''
+    name = "reference"
+
+    def reset(self):
+        '''
+        Initializes Heart Rate monitoring algorithm
+        '''
+        HRMEngine.reset(self)
+
+        # Variable definitions
+        self.peakWindowHP         = [0 for i in range(21)]
+        self.lastOnsetValueLED1   = 0
+        self.lastPeakValueLED1    = 0
+        self.HeartRate2           = 0
+        self.temp                 = 0
+        self.lastPeak             = 0
+        self.lastOnset            = 0
+        self.movingWindowHP       = 0
+        self.ispeak               = 0
+        self.movingWindowCount    = 0
+        self.foundPeak            = 0
+        self.totalFoundPeak       = 0
+        self.currentRatio         = 0
+        self.movingWindowSize     = self.frequency // 50
+        self.smallest             = (self.frequency * 60) // 220
+    # End def
+
+    def update(self, data):
+        '''
+        Heart rate measuring algorithm
+        '''
+        beat = 0
+        self.movingWindowHP += data
+
+        if self.movingWindowCount > self.movingWindowSize:
+            self.movingWindowCount = 0
+            self.HRMupdateWindow()
+            self.movingWindowHP = 0
+            self.ispeak = 0
+
+            if self.lastPeak > self.smallest:
+                self.ispeak = 1
+
+                for i in range(10):
+                    if self.peakWindowHP[10] < self.peakWindowHP[10 - i]:
+                        self.ispeak = 0
+                    if self.peakWindowHP[10] < self.peakWindowHP[10 + i]:
+                        self.ispeak = 0
+
+                if self.ispeak == 1:
+                    self.lastPeakValueLED1 = self.HRMfindMax()
+                    self.totalFoundPeak += 1
+                    self.beats += 1
+                    beat = 1
+
+                    if self.totalFoundPeak > 2:
+                        self.add_rate(self.lastPeak)
+                        self.temp = self.HRMchooseRate()
+                        if (self.temp > HRM_MIN_RATE) and (self.temp < HRM_MAX_RATE):
+                            self.HeartRate2 = self.temp
+
+                    self.ispeak = 1
+                    self.lastPeak = 0
+                    self.foundPeak += 1
+
+            if (self.lastOnset > self.smallest) and (self.ispeak == 0):
+                self.ispeak = 1
+                for i in range(10, 0, -1):
+                    if self.peakWindowHP[10] > self.peakWindowHP[10 - i]:
+                        self.ispeak = 0
+                    if self.peakWindowHP[10] > self.peakWindowHP[10 + i]:
+                        self.ispeak = 0
+
+                if self.ispeak == 1:
+                    self.lastOnsetValueLED1 = self.HRMfindMin()
+                    self.totalFoundPeak += 1
+                    self.lastOnset = 0
+                    self.foundPeak += 1
+
+            if self.foundPeak > 2:
+                self.foundPeak = 0
+                self.temp = self.HRMchooseRate()
+                if (self.temp > HRM_MIN_RATE) and (self.temp < HRM_MAX_RATE):
+                    self.HeartRate = self.temp
+
+        self.movingWindowCount += 1
+        self.lastOnset += 1
+        self.lastPeak += 1
+
+        return beat
+    # End def
+
+    def HRMupdateWindow(self):
+        for i in range(20, 0, -1):
+            self.peakWindowHP[i] = self.peakWindowHP[i - 1]
+        self.peakWindowHP[0] = self.movingWindowHP // (self.movingWindowSize + 1)
+    # End def
+
+    def HRMfindMax(self):
+        res = self.peakWindowHP[8]
+        for i in range(12, 8, -1):
+            if res < self.peakWindowHP[i]:
+                res = self.peakWindowHP[i]
+        return res
+    # End def
+
+    def HRMfindMin(self):
+        res = self.peakWindowHP[8]
+        for i in range(12, 8, -1):
+            if res > self.peakWindowHP[i]:
+                res = self.peakWindowHP[i]
+        return res
+    # End def
+
+    def HRMchooseRate(self):
+        maxx = self.HR[0]
+        minn = self.HR[0]
+        summ = 0
+        nb = 0
+
+        for i in range(7, 0, -1):
+            if self.HR[i - 1] > 0:
+                if self.HR[i - 1] > maxx:
+                    maxx = self.HR[i - 1]
+                if self.HR[i - 1] < minn:
+                    minn = self.HR[i - 1]
+
+                summ += self.HR[i - 1]
+                nb += 1
+        if nb > 2:
+            fullsum = (summ - maxx - minn)*10 // (nb - 2)
+        else:
+            fullsum = (summ)*10 // (nb + 1)
+
+        summ = fullsum // 10
+
+        if (fullsum-summ*10) > 4:
+            summ += 1
+        return summ
+    # End def
+# End class
+
+
+# ------------------------------------------------------------------------
+# AdaptiveThresholdEngine Class Definition
+# ------------------------------------------------------------------------
+class AdaptiveThresholdEngine(HRMEngine):
+    '''
+    Lightweight beat detector: smooths the signal with a short running sum,
+    removes the DC level with a running average, tracks a decaying envelope
+    of the pulse amplitude and counts a beat on each rising crossing of half
+    the envelope.  Crossings within 60 % of the average beat interval of the
+    last beat are ignored, so noise and the dicrotic wave are not counted.
+    Integer-only, O(1) per sample.
+    '''
+    name = "adaptive"
+
+    # Shifts for the low-pass running sum (2^n samples), the DC tracker and
+    # envelope decay (time constants of 2^n samples, i.e. ~0.3 s and ~2.6 s
+    # at 100 Hz) and the beat interval average (2^n beats)
+    LOWPASS_SHIFT  = 2
+    BASELINE_SHIFT = 5
+    ENVELOPE_SHIFT = 8
+    INTERVAL_SHIFT = 3
+
+    def reset(self):
+        HRMEngine.reset(self)
+
+        self.window      = None
+        self.windowPos   = 0
+        self.windowSum   = 0
+        self.baseline    = None
+        self.envelope    = 0
+        self.lastAC      = 0
+        self.sinceBeat   = 0
+        self.lastBeat    = None
+
+        # The interval average starts at the shortest interval the minimum
+        # refractory allows, so that missed beats only lengthen it slowly
+        # and the detector cannot lock onto half the heart rate
+        self.minRefractory = (self.frequency * 60) // HRM_MAX_RATE
+        self.refractory    = self.minRefractory
+        self.interval      = ((self.minRefractory * 5) // 3) << self.INTERVAL_SHIFT
+    # End def
+
+    def update(self, data):
+        if self.window is None:
+            self.window    = [data] * (1 << self.LOWPASS_SHIFT)
+            self.windowSum = data << self.LOWPASS_SHIFT
+            self.baseline  = data << self.BASELINE_SHIFT
+
+        # Low-pass: running sum of the last 2^shift samples
+        self.windowSum += data - self.window[self.windowPos]
+        self.window[self.windowPos] = data
+        self.windowPos  = (self.windowPos + 1) & (len(self.window) - 1)
+        data            = self.windowSum >> self.LOWPASS_SHIFT
+
+        # DC removal: baseline holds the running average scaled by 2^shift
+        self.baseline += data - (self.baseline >> self.BASELINE_SHIFT)
+        ac = data - (self.baseline >> self.BASELINE_SHIFT)
+
+        if ac > self.envelope:
+            self.envelope = ac
+        else:
+            self.envelope -= self.envelope >> self.ENVELOPE_SHIFT
+
+        threshold = self.envelope >> 1
+        beat      = 0
+        self.sinceBeat += 1
+
+        if (self.lastAC < threshold <= ac) and (threshold > 0) and \
+           (self.sinceBeat > self.refractory):
+            if self.lastBeat is not None:
+                self.add_rate(self.sinceBeat)
+                self.interval  += self.sinceBeat - (self.interval >> self.INTERVAL_SHIFT)
+                self.refractory = max(self.minRefractory,
+                                      ((self.interval >> self.INTERVAL_SHIFT) * 3) // 5)
+            self.lastBeat  = self.sinceBeat
+            self.sinceBeat = 0
+            self.beats    += 1
+            beat           = 1
+
+        self.lastAC = ac
+        return beat
+    # End def
+# End class
+
+
+# ------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------
+
+HRM_ENGINES = {
+    ReferenceEngine.name:         ReferenceEngine,
+    AdaptiveThresholdEngine.name: AdaptiveThresholdEngine,
+}
+
+
+def create_engine(name, frequency=HRM_FREQUENCY):
+    '''
+    Returns a new heart rate engine by name (see HRM_ENGINES)
+    '''
+    try:
+        engine_class = HRM_ENGINES[name]
+    except KeyError:
+        raise ValueError("Unknown heart rate engine '{0}' (choose from {1})".format(
+                         name, ", ".join(sorted(HRM_ENGINES))))
+    return engine_class(frequency)
+# End def
@@ -0,0 +1,277 @@
+"""
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Gateway Load Test
+--------------------------------------------------------------------------
+Copyright 2019, Octavo Systems, LLC. All rights reserved.
+
+License:
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+this list of conditions and the following disclaimer in the documentation
+and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Gateway Load Test
+
+    Runs many simulated health monitors against a gateway and reports
+    end-to-end latency percentiles, throughput and loss.  Each simulated
+    monitor behaves like send_update() in health_monitor.py: every
+    UPDATE_PERIOD seconds it opens a connection, sends one "HR ..." record
+    and waits up to gw_timeout seconds for the gateway to answer.
+
+    With --spawn-gateway a GatewayEmulator is started in the same process,
+    so a whole scenario can be run with a single command.
+
+    Runs on the host (Python 3.7+), not on the PocketBeagle.
+
+--------------------------------------------------------------------------
+Usage:
+
+    python3 load_test.py --monitors 500 --duration 60 --spawn-gateway
+                         --latency 0.05 --drop-rate 0.01
+
+    python3 load_test.py --host 192.168.0.1 --port 50000 --monitors 200
+--------------------------------------------------------------------------
+"""
+import sys
+import math
+import time
+import random
+import asyncio
+import argparse
+import collections
+
+from gateway_emulator import GatewayEmulator, REPLY_OK
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+GW_IP_ADDRESS      = "127.0.0.1"
+GW_PORT            = 50000
+
+# health_monitor.py sends one update every 700 samples of 10 ms
+UPDATE_PERIOD      = 7.0
+
+PERCENTILES        = [50, 90, 95, 99]
+
+# ------------------------------------------------------------------------
+# Global variables
+# ------------------------------------------------------------------------
+
+gw_timeout         = 5.0
+
+
+# ------------------------------------------------------------------------
+# LoadStats Class Definition
+# ------------------------------------------------------------------------
+class LoadStats(object):
+
+    def __init__(self):
+        self.latencies = []
+        self.outcomes  = collections.Counter()
+    # End def
+
+    def record(self, outcome, latency=None):
+        self.outcomes[outcome] += 1
+        if latency is not None:
+            self.latencies.append(latency)
+    # End def
+
+    def report(self, monitors, elapsed):
+        sent  = sum(self.outcomes.values())
+        acked = self.outcomes["acked"]
+        lost  = sent - acked
+
+        print("Monitors:       {0}".format(monitors))
+        print("Elapsed:        {0:0.2f} s".format(elapsed))
+        print("Records sent:   {0}".format(sent))
+        print("Records acked:  {0}".format(acked))
+        print("Records lost:   {0} ({1:0.2f} %)".format(
+              lost, (100.0 * lost / sent) if sent else 0.0))
+
+        for outcome in sorted(self.outcomes):
+            if outcome != "acked":
+                print("    {0:<12s} {1}".format(outcome, self.outcomes[outcome]))
+
+        print("Throughput:     {0:0.2f} records/s".format(
+              (acked / elapsed) if elapsed else 0.0))
+
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            for p in PERCENTILES:
+                print("Latency p{0:<3d}   {1:0.2f} ms".format(
+                      p, 1000.0 * percentile(ordered, p)))
+            print("Latency max     {0:0.2f} ms".format(1000.0 * ordered[-1]))
+    # End def
+# End class
+
+
+# ------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------
+def percentile(ordered, p):
+    '''
+    Nearest-rank percentile of an already sorted list
+    '''
+    index = int(math.ceil(p / 100.0 * len(ordered))) - 1
+    return ordered[min(max(index, 0), len(ordered) - 1)]
+# End def
+
+
+def make_record(rng):
+    '''
+    Build a record in the same format as send_update() in health_monitor.py
+    '''
+    rate_out    = rng.randint(55, 110)
+    degrees     = rng.uniform(20.0, 37.0)
+    kilopascals = rng.uniform(98.0, 103.0)
+    humidity    = rng.uniform(20.0, 60.0)
+
+    return "HR {0} {1:0.3f} {2:0.2f} {3:0.2f}".format(rate_out, degrees, kilopascals, humidity)
+# End def
+
+
+async def transmit_data(host, port, results):
+    '''
+    Send one record and wait for the reply; returns (outcome, latency)
+    '''
+    start  = time.perf_counter()
+    writer = None
+
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write((results + "\n").encode("ascii"))
+        await writer.drain()
+        reply = await reader.readline()
+    except ConnectionRefusedError:
+        return ("refused", None)
+    except (ConnectionError, OSError):
+        return ("disconnected", None)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if reply == REPLY_OK:
+        return ("acked", time.perf_counter() - start)
+    if not reply:
+        return ("disconnected", None)
+    return ("rejected", None)
+# End def
+
+
+async def simulated_monitor(host, port, period, deadline, stats, rng):
+    '''
+    One simulated health monitor: sends a record every period seconds
+    '''
+    loop = asyncio.get_running_loop()
+
+    # Start at a random phase so the fleet does not send in lock step
+    next_send = loop.time() + rng.uniform(0, period)
+
+    while next_send < deadline:
+        await asyncio.sleep(max(0, next_send - loop.time()))
+        next_send += period
+
+        try:
+            outcome, latency = await asyncio.wait_for(
+                transmit_data(host, port, make_record(rng)), gw_timeout)
+        except asyncio.TimeoutError:
+            outcome, latency = ("timeout", None)
+
+        stats.record(outcome, latency)
+# End def
+
+
+async def run_load(args):
+    global gw_timeout
+
+    gw_timeout = args.timeout
+    gateway    = None
+    host, port = args.host, args.port
+
+    if args.spawn_gateway:
+        gateway = GatewayEmulator(args.latency, args.jitter, args.drop_rate,
+                                  args.disconnect_rate, seed=args.seed)
+        host    = "127.0.0.1"
+        port    = await gateway.start(host, 0)
+        print("Gateway emulator listening on {0}:{1}".format(host, port))
+
+    stats    = LoadStats()
+    loop     = asyncio.get_running_loop()
+    start    = loop.time()
+    deadline = start + args.duration
+    rng      = random.Random(args.seed)
+
+    print("Running {0} monitors for {1:0.0f} s against {2}:{3}".format(
+          args.monitors, args.duration, host, port))
+
+    await asyncio.gather(*[
+        simulated_monitor(host, port, args.period, deadline, stats,
+                          random.Random(rng.random()))
+        for i in range(args.monitors)])
+
+    elapsed = loop.time() - start
+
+    if gateway is not None:
+        await gateway.stop()
+        print("Gateway: " + gateway.summary())
+
+    stats.report(args.monitors, elapsed)
+# End def
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Gateway load test")
+    parser.add_argument("--host", default=GW_IP_ADDRESS)
+    parser.add_argument("--port", type=int, default=GW_PORT)
+    parser.add_argument("--monitors", type=int, default=100,
+                        help="number of simulated health monitors")
+    parser.add_argument("--duration", type=float, default=60.0,
+                        help="test duration in seconds")
+    parser.add_argument("--period", type=float, default=UPDATE_PERIOD,
+                        help="seconds between updates from one monitor")
+    parser.add_argument("--timeout", type=float, default=gw_timeout,
+                        help="seconds to wait for the gateway to answer")
+    parser.add_argument("--seed", type=int, default=None)
+
+    group = parser.add_argument_group("spawned gateway emulator")
+    group.add_argument("--spawn-gateway", action="store_true",
+                       help="run a local gateway emulator in-process")
+    group.add_argument("--latency", type=float, default=0.0)
+    group.add_argument("--jitter", type=float, default=0.0)
+    group.add_argument("--drop-rate", type=float, default=0.0)
+    group.add_argument("--disconnect-rate", type=float, default=0.0)
+    return parser.parse_args(argv)
+# End def
+
+
+# ------------------------------------------------------------------------
+# Main code
+# ------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_load(parse_args(sys.argv[1:])))
+    except KeyboardInterrupt:
+        pass
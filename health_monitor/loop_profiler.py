@@ -0,0 +1,329 @@
+"""
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Sampling Loop Profiler
+--------------------------------------------------------------------------
+Copyright 2019, Octavo Systems, LLC. All rights reserved.
+
+License:
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+this list of conditions and the following disclaimer in the documentation
+and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Sampling Loop Profiler
+
+    Stage timers for the sampling loop.  Call begin() at the top of every
+    loop iteration and lap("<stage>") after each stage; the time since the
+    previous lap is added to that stage's histogram.  Each power of two
+    of microseconds is split into HIST_SUB_BUCKETS linear buckets, so a
+    bucket is at most ~3 % wide (256 us around the 10 ms sample period);
+    percentiles are interpolated within the bucket.
+
+    Signals (install_signals()):
+        SIGUSR1  - print the stage summary and the effective sample rate
+                   for the interval since the last summary
+        SIGUSR2  - start / stop a cProfile (and tracemalloc, on Python 3)
+                   capture; on stop the results are written to CAPTURE_DIR
+                   and the top entries are printed
+
+    Signal handlers only set a flag; the work is done at the next begin()
+    so it is not charged to whichever stage was interrupted.
+
+    e.g.  kill -USR1 $(pgrep -f health_monitor.py)
+--------------------------------------------------------------------------
+"""
+import os
+import sys
+import time
+import signal
+import pstats
+import cProfile
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+PROFILE_FREQUENCY  = 100
+
+# Log-linear histogram: 2^HIST_SUB_BITS buckets per power of two (in us),
+# covering up to 2^32 us
+HIST_SUB_BITS      = 5
+HIST_SUB_BUCKETS   = 1 << HIST_SUB_BITS
+HIST_BUCKETS       = (33 - HIST_SUB_BITS) * HIST_SUB_BUCKETS
+
+CAPTURE_DIR        = "logs"
+CAPTURE_TOP        = 20
+
+if hasattr(time, "perf_counter"):
+    clock = time.perf_counter
+else:
+    clock = time.time
+
+
+# ------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------
+def bucket_index(us):
+    '''
+    Histogram bucket of a duration in whole microseconds
+    '''
+    if us < HIST_SUB_BUCKETS:
+        return us
+
+    shift = us.bit_length() - 1 - HIST_SUB_BITS
+    index = (shift + 1) * HIST_SUB_BUCKETS + ((us >> shift) & (HIST_SUB_BUCKETS - 1))
+    return min(index, HIST_BUCKETS - 1)
+# End def
+
+
+def bucket_range(index):
+    '''
+    Returns (lower bound, width) in microseconds of a histogram bucket
+    '''
+    if index < HIST_SUB_BUCKETS:
+        return index, 1
+
+    shift = index // HIST_SUB_BUCKETS - 1
+    sub   = index % HIST_SUB_BUCKETS
+    return (HIST_SUB_BUCKETS + sub) << shift, 1 << shift
+# End def
+
+
+# ------------------------------------------------------------------------
+# StageStats Class Definition
+# ------------------------------------------------------------------------
+class StageStats(object):
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max   = 0.0
+        self.hist  = [0] * HIST_BUCKETS
+    # End def
+
+    def percentile(self, p):
+        '''
+        Percentile p in seconds, interpolated within its histogram bucket
+        '''
+        target = self.count * p / 100.0
+        seen   = 0
+        for bucket, n in enumerate(self.hist):
+            if (n > 0) and (seen + n >= target):
+                low, width = bucket_range(bucket)
+                value      = (low + width * (target - seen) / float(n)) / 1000000.0
+                return min(value, self.max)
+            seen += n
+        return self.max
+    # End def
+# End class
+
+
+# ------------------------------------------------------------------------
+# LoopProfiler Class Definition
+# ------------------------------------------------------------------------
+class LoopProfiler(object):
+
+    def __init__(self, frequency=PROFILE_FREQUENCY, enabled=True,
+                 capture_dir=CAPTURE_DIR):
+        '''
+        LoopProfiler(frequency, enabled, capture_dir)
+        frequency is the nominal sample rate of the loop in Hz; with
+        enabled=False begin() and lap() return immediately
+        '''
+        self.frequency      = frequency
+        self.enabled        = enabled
+        self.capture_dir    = capture_dir
+        self.profile        = None
+        self.dump_pending   = False
+        self.toggle_pending = False
+        self.reset()
+    # End def
+
+    def reset(self):
+        '''
+        Clears all stage statistics and starts a new interval
+        '''
+        self.stages       = {}
+        self.order        = []
+        self.samples      = 0
+        self.window_start = clock()
+        self.last         = self.window_start
+    # End def
+
+    def begin(self):
+        '''
+        Marks the start of one loop iteration (one sample)
+        '''
+        if not self.enabled:
+            return
+
+        if self.dump_pending or self.toggle_pending:
+            self.handle_pending()
+
+        self.samples += 1
+        self.last     = clock()
+    # End def
+
+    def lap(self, stage):
+        '''
+        Charges the time since the previous lap (or begin) to stage
+        '''
+        if not self.enabled:
+            return
+
+        now       = clock()
+        elapsed   = now - self.last
+        self.last = now
+
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = StageStats()
+            self.order.append(stage)
+
+        stats.count += 1
+        stats.total += elapsed
+        if elapsed > stats.max:
+            stats.max = elapsed
+        stats.hist[bucket_index(int(elapsed * 1000000))] += 1
+    # End def
+
+    def effective_rate(self):
+        '''
+        Samples per second achieved since the start of the interval
+        '''
+        elapsed = clock() - self.window_start
+        if elapsed <= 0:
+            return 0.0
+        return self.samples / elapsed
+    # End def
+
+    def summary(self):
+        elapsed = clock() - self.window_start
+        loop    = sum(stats.total for stats in self.stages.values()) or 1.0
+        rate    = self.effective_rate()
+        lines   = []
+
+        lines.append("--- Sampling loop: {0} samples in {1:0.1f} s ---".format(
+                     self.samples, elapsed))
+        lines.append("Effective sample rate: {0:0.2f} Hz (nominal {1} Hz, {2:0.1f} %)".format(
+                     rate, self.frequency, 100.0 * rate / self.frequency))
+        lines.append("| {0:<12s} | {1:>8s} | {2:>9s} | {3:>9s} | {4:>9s} | {5:>9s} | {6:>6s} |".format(
+                     "stage", "count", "mean us", "p50 us", "p99 us", "max us", "% loop"))
+        lines.append("|--------------|----------|-----------|-----------|-----------|-----------|--------|")
+
+        for stage in self.order:
+            stats = self.stages[stage]
+            lines.append("| {0:<12s} | {1:>8d} | {2:>9.1f} | {3:>9.0f} | {4:>9.0f} | {5:>9.1f} | {6:>6.1f} |".format(
+                         stage, stats.count,
+                         1000000.0 * stats.total / stats.count,
+                         1000000.0 * stats.percentile(50),
+                         1000000.0 * stats.percentile(99),
+                         1000000.0 * stats.max,
+                         100.0 * stats.total / loop))
+
+        return "\n".join(lines)
+    # End def
+
+    def dump(self):
+        '''
+        Prints the summary and starts a new interval
+        '''
+        print(self.summary())
+        sys.stdout.flush()
+        self.reset()
+    # End def
+
+    def install_signals(self, dump_signal=signal.SIGUSR1,
+                        capture_signal=signal.SIGUSR2):
+        '''
+        Installs the signal handlers (main thread only)
+        '''
+        signal.signal(dump_signal, self.request_dump)
+        signal.signal(capture_signal, self.request_toggle)
+    # End def
+
+    def request_dump(self, signum, frame):
+        self.dump_pending = True
+    # End def
+
+    def request_toggle(self, signum, frame):
+        self.toggle_pending = True
+    # End def
+
+    def handle_pending(self):
+        if self.dump_pending:
+            self.dump_pending = False
+            self.dump()
+
+        if self.toggle_pending:
+            self.toggle_pending = False
+            if self.profile is None:
+                self.start_capture()
+            else:
+                self.stop_capture()
+    # End def
+
+    def start_capture(self):
+        print("--- Profile capture started ---")
+        if tracemalloc is not None:
+            tracemalloc.start()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+    # End def
+
+    def stop_capture(self):
+        '''
+        Stops the capture, saves the results and prints the top entries
+        '''
+        self.profile.disable()
+        profile      = self.profile
+        self.profile = None
+
+        name = time.strftime("profile-%Y%m%d-%H%M%S")
+        if not os.path.isdir(self.capture_dir):
+            os.makedirs(self.capture_dir)
+
+        filename = os.path.join(self.capture_dir, name + ".prof")
+        profile.dump_stats(filename)
+        print("--- Profile capture saved to {0} ---".format(filename))
+        pstats.Stats(profile, stream=sys.stdout).sort_stats("cumulative").print_stats(CAPTURE_TOP)
+
+        if tracemalloc is not None:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+            filename = os.path.join(self.capture_dir, name + ".mem")
+            snapshot.dump(filename)
+            print("--- Memory snapshot saved to {0} ---".format(filename))
+            for stat in snapshot.statistics("lineno")[:CAPTURE_TOP]:
+                print(stat)
+
+        sys.stdout.flush()
+    # End def
+# End class
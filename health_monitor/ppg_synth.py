@@ -0,0 +1,108 @@
+"""
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Synthetic PPG
+--------------------------------------------------------------------------
+Copyright 2019, Octavo Systems, LLC. All rights reserved.
+
+License:
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+this list of conditions and the following disclaimer in the documentation
+and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Synthetic PPG
+
+    Generates LED1-ALED1 like PPG waveforms for the benchmarks, and loads
+    recorded waveforms (one integer sample per line, 100 Hz).
+--------------------------------------------------------------------------
+"""
+import math
+import random
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+PPG_FREQUENCY      = 100
+
+PPG_BASELINE       = 150000
+PPG_AMPLITUDE      = 3000
+PPG_WANDER         = 1500
+PPG_NOISE          = 100
+
+
+# ------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------
+def pulse_shape(phase):
+    '''
+    One heart beat, phase in [0, 1): systolic peak followed by a smaller
+    dicrotic wave
+    '''
+    systolic  = math.exp(-((phase - 0.20) / 0.08) ** 2)
+    dicrotic  = 0.35 * math.exp(-((phase - 0.50) / 0.10) ** 2)
+    return systolic + dicrotic
+# End def
+
+
+def synthetic_ppg(rate, seconds, frequency=PPG_FREQUENCY, variability=0.05,
+                  noise=PPG_NOISE, seed=None):
+    '''
+    Returns a list of integer samples of a PPG signal at roughly rate beats
+    per minute; each beat interval varies by up to +/- variability
+    '''
+    rng      = random.Random(seed)
+    samples  = []
+    phase    = 0.0
+    period   = 60.0 / rate
+
+    for n in range(int(seconds * frequency)):
+        t     = float(n) / frequency
+        value = (PPG_BASELINE +
+                 PPG_AMPLITUDE * pulse_shape(phase) +
+                 PPG_WANDER * math.sin(2 * math.pi * 0.25 * t) +
+                 rng.gauss(0, noise))
+        samples.append(int(value))
+
+        phase += 1.0 / (period * frequency)
+        if phase >= 1.0:
+            phase -= 1.0
+            period = (60.0 / rate) * (1 + rng.uniform(-variability, variability))
+
+    return samples
+# End def
+
+
+def load_recording(filename):
+    '''
+    Loads a recorded waveform: one integer sample per line, '#' comments
+    '''
+    samples = []
+    with open(filename) as f:
+        for line in f:
+            line = line.split("#")[0].strip()
+            if line:
+                samples.append(int(line))
+    return samples
+# End def
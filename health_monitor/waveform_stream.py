@@ -0,0 +1,330 @@
+"""
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Waveform Streaming
+--------------------------------------------------------------------------
+Copyright 2019, Octavo Systems, LLC. All rights reserved.
+
+License:
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+this list of conditions and the following disclaimer in the documentation
+and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+--------------------------------------------------------------------------
+PocketBeagle - Health Monitor - Waveform Streaming
+
+    Streams the raw LED1-ALED1 waveform to the gateway.  Samples are
+    collected into fixed-duration chunks; each chunk is delta encoded
+    (zigzag varints), zlib compressed and sent as one frame:
+
+        magic     2 bytes   "WF"
+        version   1 byte
+        session   1 byte    random per streamer (i.e. per boot)
+        sequence  4 bytes   increments by one per chunk
+        timestamp 8 bytes   time.time() of the first sample (double)
+        frequency 2 bytes   sample rate in Hz
+        count     2 bytes   number of samples
+        length    4 bytes   payload length
+        payload   length bytes
+
+    All fields are big-endian.  Frames go over a separate TCP connection
+    (WF_PORT) from a background thread, so the sampling loop never blocks
+    on the network.  When the send queue is full or the gateway cannot be
+    reached, frames are dropped; the receiver sees this as a gap in the
+    sequence numbers.  A new session id, or a sequence number that does
+    not increase, means the board restarted and is not counted as a gap
+    (see sequence_gap()).
+--------------------------------------------------------------------------
+"""
+import time
+import zlib
+import random
+import struct
+import socket
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+WF_MAGIC           = b"WF"
+WF_VERSION         = 1
+WF_HEADER          = struct.Struct(">2sBBIdHHI")
+
+WF_FREQUENCY       = 100
+WF_CHUNK_SECONDS   = 1.0
+WF_COMPRESSION     = 6
+
+WF_QUEUE_SIZE      = 32
+WF_RETRY_DELAY     = 5.0
+
+
+# ------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------
+def delta_encode(samples):
+    '''
+    First sample, then sample-to-sample differences, as zigzag varints
+    '''
+    out  = bytearray()
+    last = 0
+
+    for value in samples:
+        delta = value - last
+        last  = value
+        delta = (delta << 1) ^ (delta >> 63)
+        while delta > 0x7f:
+            out.append((delta & 0x7f) | 0x80)
+            delta >>= 7
+        out.append(delta)
+
+    return bytes(out)
+# End def
+
+
+def delta_decode(data, count):
+    samples = []
+    last    = 0
+    data    = bytearray(data)
+    pos     = 0
+
+    for i in range(count):
+        shift = 0
+        delta = 0
+        while True:
+            byte   = data[pos]
+            pos   += 1
+            delta |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        last += (delta >> 1) ^ -(delta & 1)
+        samples.append(last)
+
+    return samples
+# End def
+
+
+def encode_frame(sequence, timestamp, samples, frequency=WF_FREQUENCY,
+                 level=WF_COMPRESSION, session=0):
+    '''
+    Returns one complete frame (header + compressed payload) as bytes
+    '''
+    payload = zlib.compress(delta_encode(samples), level)
+    header  = WF_HEADER.pack(WF_MAGIC, WF_VERSION, session, sequence & 0xffffffff,
+                             timestamp, frequency, len(samples), len(payload))
+    return header + payload
+# End def
+
+
+def decode_header(header):
+    '''
+    Returns (session, sequence, timestamp, frequency, count, length) of a
+    frame header
+    '''
+    magic, version, session, sequence, timestamp, frequency, count, length = \
+        WF_HEADER.unpack(header)
+
+    if (magic != WF_MAGIC) or (version != WF_VERSION):
+        raise ValueError("Not a waveform frame")
+
+    return session, sequence, timestamp, frequency, count, length
+# End def
+
+
+def sequence_gap(last, session, sequence):
+    '''
+    Number of frames missing between the previous frame, last = (session,
+    sequence) or None, and this one.  A changed session or a sequence that
+    does not increase means the board restarted: no gap is counted.
+    '''
+    if (last is None) or (last[0] != session) or (sequence <= last[1]):
+        return 0
+    return sequence - last[1] - 1
+# End def
+
+
+def decode_payload(payload, count):
+    '''
+    Returns the samples of a frame payload; raises ValueError if corrupt
+    '''
+    try:
+        return delta_decode(zlib.decompress(payload), count)
+    except (zlib.error, IndexError):
+        raise ValueError("Corrupt waveform payload")
+# End def
+
+
+# ------------------------------------------------------------------------
+# WaveformSender Class Definition
+# ------------------------------------------------------------------------
+class WaveformSender(object):
+
+    def __init__(self, host, port, timeout=5.0, queue_size=WF_QUEUE_SIZE):
+        '''
+        WaveformSender(host, port)
+        Sends frames to host:port from a background thread
+        '''
+        self.host       = host
+        self.port       = port
+        self.timeout    = timeout
+        self.frames     = queue.Queue(queue_size)
+        self.sock       = None
+        self.next_retry = 0
+        self.sent       = 0
+        self.sent_bytes = 0
+        self.dropped    = 0
+
+        self.thread        = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+    # End def
+
+    def send(self, frame):
+        '''
+        Queues a frame without blocking; returns False if it was dropped
+        '''
+        try:
+            self.frames.put_nowait(frame)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+    # End def
+
+    def run(self):
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+
+            if not self.connect():
+                self.dropped += 1
+                continue
+
+            try:
+                self.sock.sendall(frame)
+                self.sent       += 1
+                self.sent_bytes += len(frame)
+            except (socket.error, socket.timeout):
+                print("Cannot transmit waveform!")
+                self.disconnect()
+                self.dropped += 1
+
+        self.disconnect()
+    # End def
+
+    def connect(self):
+        if self.sock is not None:
+            return True
+
+        if time.time() < self.next_retry:
+            return False
+
+        try:
+            self.sock = socket.create_connection((self.host, self.port), self.timeout)
+            return True
+        except (socket.error, socket.timeout):
+            print("Cannot connect to waveform gateway!")
+            self.sock       = None
+            self.next_retry = time.time() + WF_RETRY_DELAY
+            return False
+    # End def
+
+    def disconnect(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except socket.error:
+                pass
+            self.sock = None
+    # End def
+
+    def close(self, timeout=None):
+        '''
+        close()
+        Sends the frames already queued and stops the background thread
+        '''
+        self.frames.put(None)
+        self.thread.join(timeout)
+    # End def
+# End class
+
+
+# ------------------------------------------------------------------------
+# WaveformStreamer Class Definition
+# ------------------------------------------------------------------------
+class WaveformStreamer(object):
+
+    def __init__(self, sender, frequency=WF_FREQUENCY,
+                 chunk_seconds=WF_CHUNK_SECONDS, level=WF_COMPRESSION):
+        '''
+        WaveformStreamer(sender, frequency, chunk_seconds, level)
+        Collects samples into chunks of chunk_seconds and passes each
+        encoded frame to sender.send()
+        '''
+        self.sender     = sender
+        self.frequency  = frequency
+        self.chunk_size = int(frequency * chunk_seconds)
+        self.level      = level
+        self.session    = random.randrange(256)
+        self.sequence   = 0
+        self.samples    = []
+        self.timestamp  = 0
+    # End def
+
+    def add_sample(self, data):
+        if not self.samples:
+            self.timestamp = time.time()
+
+        self.samples.append(data)
+
+        if len(self.samples) >= self.chunk_size:
+            self.flush()
+    # End def
+
+    def flush(self):
+        '''
+        Sends the current (possibly partial) chunk
+        '''
+        if not self.samples:
+            return
+
+        frame = encode_frame(self.sequence, self.timestamp, self.samples,
+                             self.frequency, self.level, self.session)
+        self.sender.send(frame)
+
+        self.sequence += 1
+        self.samples   = []
+    # End def
+
+    def close(self, timeout=None):
+        self.flush()
+        self.sender.close(timeout)
+    # End def
+# End class